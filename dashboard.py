@@ -1,42 +1,49 @@
 #!/usr/bin/env python3
 
+import os
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-from s3_analysis import S3Analyzer # Make sure s3_analysis.py exists and is correct
+from datetime import datetime
+from s3_analysis import S3Analyzer, read_config # Make sure s3_analysis.py exists and is correct
 import time
-import yaml # Added import for yaml
-
-# Page config
-st.set_page_config(
-    page_title="S3 Analytics Dashboard",
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Custom CSS
-st.markdown("""
-    <style>
-    .metric-card {
-        background-color: #f0f2f6;
-        padding: 20px;
-        border-radius: 10px;
-        margin: 10px;
-    }
-    .stProgress > div > div > div > div {
-        background-color: #1f77b4;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+
+try:
+    import polars as pl # Optional: lazy, multi-threaded filtering of the objects table
+except ImportError:
+    pl = None
+
+class AnalysisFailed(Exception):
+    """Raised by _cached_analyze when the analyzer returned no results."""
+
+def setup_page():
+    """Applies the Streamlit page configuration and custom CSS."""
+    # Page config
+    st.set_page_config(
+        page_title="S3 Analytics Dashboard",
+        page_icon="📊",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+
+    # Custom CSS
+    st.markdown("""
+        <style>
+        .metric-card {
+            background-color: #f0f2f6;
+            padding: 20px;
+            border-radius: 10px;
+            margin: 10px;
+        }
+        .stProgress > div > div > div > div {
+            background-color: #1f77b4;
+        }
+        </style>
+        """, unsafe_allow_html=True)
 
 # Function to load config safely
 def load_config(config_path='config.yaml'):
     try:
-        with open(config_path, 'r') as f:
-            return yaml.safe_load(f)
+        return read_config(config_path) # Parsed once per process, shared with S3Analyzer
     except FileNotFoundError:
         st.error(f"Configuration file '{config_path}' not found.")
         return None
@@ -44,18 +51,69 @@ def load_config(config_path='config.yaml'):
         st.error(f"Error loading configuration: {e}")
         return None
 
+@st.cache_resource(max_entries=1, show_spinner=False)
+def get_analyzer(config_path='config.yaml', config_mtime=None):
+    """
+    Builds one S3Analyzer (config + boto3 client) per process, shared by all
+    sessions. Keyed on the config file's mtime, so editing config.yaml builds a
+    fresh analyzer (credentials, analysis.*, inventory) on the next rerun.
+    """
+    return S3Analyzer(config_path, on_error=st.error, on_warning=st.warning)
+
+def _cached_analyze(analyzer, bucket_name, prefix, as_directory, refresh=False):
+    """
+    Runs the S3 analysis through the analyzer's result cache. The analyzer is
+    shared by all sessions, and a cached result is only reused while its
+    freshness probe still matches (see S3Analyzer._cache_validator). Filter
+    interactions never call this; only Run Analysis / Refresh do. Refresh
+    re-lists and replaces the cached entry (also on disk with analysis.cache_dir).
+    Failures raise AnalysisFailed (the analyzer never caches them).
+    """
+    results = analyzer.analyze_bucket(bucket_name, prefix, as_directory=as_directory, refresh=refresh,
+                                      detail_level='full') # The table and filters need every object
+    if results is None:
+        raise AnalysisFailed(f"Analysis of {bucket_name}/{prefix} failed")
+    return results
+
+def _export_frame(df):
+    """
+    Formats 'Last Modified' the way both exports write it. Timestamps stay
+    datetime64 through the analysis; this formats them in one vectorized pass.
+    Frames from the Polars path are Arrow-backed, whose '%S' would include
+    fractional seconds, so the column is brought back to datetime64 first.
+    """
+    last_modified = df['Last Modified'].astype('datetime64[ns, UTC]')
+    return df.assign(**{'Last Modified': last_modified.dt.strftime('%Y-%m-%d %H:%M:%S')})
+
+@st.cache_data(max_entries=4, ttl=600, show_spinner=False) # Each entry holds a full encoded export
+def _to_csv_bytes(df_hash, _df):
+    """Encodes the filtered frame as CSV with Arrow's writer, once per distinct frame."""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    buf = pa.BufferOutputStream()
+    pacsv.write_csv(pa.Table.from_pandas(_export_frame(_df), preserve_index=False), buf)
+    return buf.getvalue().to_pybytes()
+
+@st.cache_data(max_entries=4, ttl=600, show_spinner=False) # Each entry holds a full encoded export
+def _to_json_bytes(df_hash, _df):
+    """Encodes the filtered frame as JSON records with orjson, once per distinct frame."""
+    import orjson
+    return orjson.dumps(_export_frame(_df).to_dict('records'))
+
+setup_page()
+
 # Load configuration
 config = load_config()
 
 # Initialize session state only if config loaded successfully
 if config:
-    if 'analyzer' not in st.session_state:
-        try:
-            st.session_state.analyzer = S3Analyzer('config.yaml')
-        except Exception as e:
-            st.error(f"Failed to initialize S3 Analyzer: {e}")
-            # Stop the app if analyzer can't be initialized
-            st.stop()
+    try:
+        # A cache lookup on most reruns; rebuilt only after config.yaml changes
+        st.session_state.analyzer = get_analyzer('config.yaml', os.path.getmtime('config.yaml'))
+    except Exception as e:
+        st.error(f"Failed to initialize S3 Analyzer: {e}")
+        # Stop the app if analyzer can't be initialized
+        st.stop()
     if 'last_analysis' not in st.session_state:
         st.session_state.last_analysis = None
 else:
@@ -74,9 +132,14 @@ with st.sidebar:
     # Bucket selection
     bucket_name_input = st.text_input("Bucket Name", value=default_bucket)
     prefix_input = st.text_input("Prefix", value=default_prefix)
+    as_directory = st.checkbox("Treat prefix as directory", value=True,
+                               help="Append a trailing '/' to the prefix so S3 can seek directly to it")
 
     # Analysis controls
-    if st.button("Run Analysis", type="primary"):
+    run_clicked = st.button("Run Analysis", type="primary")
+    refresh_clicked = st.button("Refresh", help="Discard cached results and re-list the bucket")
+
+    if run_clicked or refresh_clicked:
         # Strip whitespace from inputs
         bucket_name = bucket_name_input.strip()
         prefix = prefix_input.strip()
@@ -89,16 +152,26 @@ with st.sidebar:
                 # Ensure analyzer is available before calling analyze_bucket
                 if 'analyzer' in st.session_state:
                     try:
-                        results = st.session_state.analyzer.analyze_bucket(bucket_name, prefix)
-                        if results:
+                        results = _cached_analyze(st.session_state.analyzer, bucket_name, prefix, as_directory,
+                                                  refresh=refresh_clicked)
+                        if results: # Always set; failures raise AnalysisFailed
+                            # Prepare the table frame once here; filter reruns reuse it as-is.
+                            # It replaces 'objects' so each session holds the table only once
+                            # (the analyzer's cached dict is shared, so it is copied, not mutated)
+                            objects = (results['objects']
+                                       .dropna(subset=['Last Modified'])
+                                       .sort_values('Last Modified')
+                                       .reset_index(drop=True))
+                            if pl is not None:
+                                # Sorted flag lets Polars use binary search for the date bounds
+                                objects = pl.from_pandas(objects).with_columns(pl.col('Last Modified').set_sorted())
                             st.session_state.last_analysis = {
-                                'results': results,
+                                'results': dict(results, objects=objects),
                                 'timestamp': datetime.now(),
-                                'duration': time.time() - start_time
+                                'duration': time.time() - start_time,
                             }
-                        else:
-                            # Error is already displayed by S3Analyzer
-                            pass # st.error("Failed to analyze bucket. Check logs for details.")
+                    except AnalysisFailed:
+                        pass # Error is already displayed by S3Analyzer
                     except Exception as e:
                          st.error(f"An unexpected error occurred during analysis: {e}")
                          st.session_state.last_analysis = None # Clear previous results on error
@@ -125,6 +198,12 @@ if st.session_state.get('last_analysis') and st.session_state.last_analysis.get(
         with col4:
             st.metric("Analysis Time", f"{st.session_state.last_analysis.get('duration', 0):.2f}s")
 
+        if results.get('source') == 'inventory':
+            st.caption(f"Source: S3 Inventory snapshot {results.get('inventory_snapshot')} "
+                       f"({results.get('inventory_age_hours')}h old)")
+        else:
+            st.caption("Source: live listing")
+
         st.markdown("---") # Separator
 
         # --- Charts ---
@@ -134,6 +213,7 @@ if st.session_state.get('last_analysis') and st.session_state.last_analysis.get(
             st.subheader("Object Size Distribution")
             size_dist_data = results.get('size_distribution')
             if size_dist_data and sum(size_dist_data.values()) > 0:
+                import plotly.express as px # Deferred: only paid when a chart is drawn
                 size_df = pd.DataFrame({
                     'Category': list(size_dist_data.keys()),
                     'Count': list(size_dist_data.values())
@@ -155,6 +235,7 @@ if st.session_state.get('last_analysis') and st.session_state.last_analysis.get(
             st.subheader("Storage Class Distribution")
             storage_dist_data = results.get('storage_class_distribution')
             if storage_dist_data and sum(storage_dist_data.values()) > 0:
+                import plotly.express as px
                 storage_df = pd.DataFrame({
                     'Class': list(storage_dist_data.keys()),
                     'Count': list(storage_dist_data.values())
@@ -172,13 +253,10 @@ if st.session_state.get('last_analysis') and st.session_state.last_analysis.get(
 
         # --- Objects Table with Filters ---
         st.subheader("Object Details")
-        objects_data = results.get('objects')
+        df = results.get('objects') # pandas, or a Polars frame when Polars is installed
+        is_polars = pl is not None and isinstance(df, pl.DataFrame)
 
-        if objects_data:
-            df = pd.DataFrame(objects_data)
-            # Convert Last Modified safely, coercing errors
-            df['Last Modified'] = pd.to_datetime(df['Last Modified'], errors='coerce')
-            df = df.dropna(subset=['Last Modified']) # Remove rows where date conversion failed
+        if df is not None and len(df) > 0:
 
             # --- Filters ---
             filter_col1, filter_col2, filter_col3 = st.columns(3)
@@ -187,14 +265,15 @@ if st.session_state.get('last_analysis') and st.session_state.last_analysis.get(
                 min_size_filter, max_size_filter = st.slider(
                     "Filter by Size (MB)",
                     min_value=0.0,
-                    max_value=float(df['Size (MB)'].max()) if not df.empty else 100.0, # Dynamic max or default
-                    value=(0.0, float(df['Size (MB)'].max()) if not df.empty else 100.0),
+                    max_value=float(df['Size (MB)'].max()),
+                    value=(0.0, float(df['Size (MB)'].max())),
                     step=0.1
                 )
             with filter_col2:
-                 # Use min/max dates from data if available, otherwise default
-                min_date = df['Last Modified'].min().date() if not df.empty else (datetime.now() - timedelta(days=30)).date()
-                max_date = df['Last Modified'].max().date() if not df.empty else datetime.now().date()
+                # The frame is sorted by 'Last Modified', so the ends are the date bounds
+                last_modified = df['Last Modified'] if is_polars else df['Last Modified'].iloc
+                min_date = last_modified[0].date()
+                max_date = last_modified[-1].date()
 
                 start_date, end_date = st.date_input(
                     "Filter by Last Modified Date",
@@ -204,18 +283,31 @@ if st.session_state.get('last_analysis') and st.session_state.last_analysis.get(
                  )
             with filter_col3:
                 # Filter by storage class
-                available_classes = ['All'] + sorted(df['Storage Class'].unique())
+                classes = df['Storage Class'].unique().to_list() if is_polars else df['Storage Class'].unique()
+                available_classes = ['All'] + sorted(classes)
                 selected_class = st.selectbox("Filter by Storage Class", options=available_classes)
 
-            # Apply filters
-            filtered_df = df[
-                (df['Size (MB)'] >= min_size_filter) &
-                (df['Size (MB)'] <= max_size_filter) &
-                (df['Last Modified'].dt.date >= start_date) &
-                (df['Last Modified'].dt.date <= end_date)
-            ]
-            if selected_class != 'All':
-                filtered_df = filtered_df[filtered_df['Storage Class'] == selected_class]
+            start_ts = pd.Timestamp(start_date, tz='UTC')
+            end_ts = pd.Timestamp(end_date, tz='UTC') + pd.Timedelta(days=1)
+            if is_polars:
+                # Apply filters: one fused lazy Polars plan, collected once per rerun
+                filtered_df = df.lazy().filter(
+                    pl.col('Size (MB)').is_between(min_size_filter, max_size_filter) &
+                    (pl.col('Last Modified') >= start_ts.to_pydatetime()) &
+                    (pl.col('Last Modified') < end_ts.to_pydatetime()) &
+                    ((pl.col('Storage Class') == selected_class) if selected_class != 'All' else pl.lit(True))
+                ).collect().to_pandas(use_pyarrow_extension_array=True)
+            else:
+                # Apply filters: df is sorted by 'Last Modified', so the date range is a
+                # contiguous slice found by binary search; only that slice is scanned
+                # for the size bounds (one fused numexpr pass)
+                lo, hi = df['Last Modified'].searchsorted([start_ts, end_ts], side='left')
+                filtered_df = df.iloc[lo:hi].query(
+                    "`Size (MB)` >= @min_size_filter and `Size (MB)` <= @max_size_filter",
+                    engine='numexpr'
+                )
+                if selected_class != 'All':
+                    filtered_df = filtered_df[filtered_df['Storage Class'] == selected_class]
 
             # Display filtered table
             st.dataframe(
@@ -241,8 +333,10 @@ if st.session_state.get('last_analysis') and st.session_state.last_analysis.get(
             # --- Export Options ---
             st.subheader("Export Filtered Data")
             export_col1, export_col2 = st.columns(2)
-            csv = filtered_df.to_csv(index=False).encode('utf-8')
-            json_data = filtered_df.to_json(orient='records', date_format='iso').encode('utf-8')
+            # Only re-encode when the filtered frame actually changes
+            filtered_hash = int(pd.util.hash_pandas_object(filtered_df).sum())
+            csv = _to_csv_bytes(filtered_hash, filtered_df)
+            json_data = _to_json_bytes(filtered_hash, filtered_df)
 
             with export_col1:
                 st.download_button(
@@ -1,60 +1,399 @@
 #!/usr/bin/env python3
 
+import asyncio
+import functools
+import json
+import os
+import queue
+import threading
 import boto3
+import cachetools
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 import yaml
-import streamlit as st # Keep Streamlit import for st.error
+from pyarrow import fs as pafs
 import time
 import logging
-from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError, ProfileNotFound
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import botocore.session
+from botocore import parsers as botocore_parsers
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError, PartialCredentialsError, ProfileNotFound
+
+try:
+    from yaml import CSafeLoader as YamlLoader # libyaml C parser when PyYAML was built with it
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+try:
+    from lxml import etree as lxml_etree # Optional: libxml2-backed parsing of ListObjectsV2 responses
+except ImportError:
+    lxml_etree = None
+
+try:
+    import numba # Optional: JIT-compiled size histogram
+except ImportError:
+    numba = None
+
+try:
+    import aioboto3 # Optional: asyncio-based concurrent listing
+    from aiobotocore import parsers as aiobotocore_parsers
+    from aiobotocore.session import AioSession
+except ImportError:
+    aioboto3 = None
+
+try:
+    import diskcache # Optional: result cache that survives restarts
+except ImportError:
+    diskcache = None
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+SIZE_LABELS = ["Small (<1MB)", "Medium (1-10MB)", "Large (10-100MB)", "Very Large (>100MB)"]
+# Lower bounds (inclusive, in bytes) of the last three size labels; binning stays in integers
+SIZE_THRESHOLDS_BYTES = np.array([1 << 20, 10 << 20, 100 << 20], dtype=np.int64)
+# How much per-object detail analyze_bucket returns alongside the aggregates
+DETAIL_LEVELS = ('summary', 'top_n', 'full')
+# Closed vocabulary of S3 storage classes, so the column is coded once against fixed categories
+STORAGE_CLASS_DTYPE = pd.CategoricalDtype(categories=[
+    'STANDARD', 'STANDARD_IA', 'ONEZONE_IA', 'INTELLIGENT_TIERING', 'GLACIER', 'GLACIER_IR',
+    'DEEP_ARCHIVE', 'REDUCED_REDUNDANCY', 'EXPRESS_ONEZONE', 'OUTPOSTS', 'SNOW'
+], ordered=False)
+# Only the listing fields we use; pages are converted straight into this Arrow layout
+LISTING_SCHEMA = pa.schema([
+    ('Key', pa.string()),
+    ('Size', pa.int64()),
+    ('LastModified', pa.timestamp('us', 'UTC')),
+    ('StorageClass', pa.dictionary(pa.int8(), pa.string())),
+])
+
+def read_config(config_path):
+    """
+    Parses a YAML (or .json) config file and returns a cached dict until the
+    file's mtime changes. Callers must treat the result as read-only.
+    """
+    return _read_config(config_path, os.path.getmtime(config_path))
+
+@functools.lru_cache(maxsize=8)
+def _read_config(config_path, mtime):
+    with open(config_path, 'r') as f:
+        if config_path.endswith('.json'):
+            return json.load(f)
+        return yaml.load(f, Loader=YamlLoader)
+
+try:
+    datetime.fromisoformat('2000-01-01T00:00:00.000Z')
+    _fromisoformat = datetime.fromisoformat
+except ValueError:
+    # Before Python 3.11 fromisoformat rejects the 'Z' suffix S3 always sends;
+    # decide that once here rather than raising and falling back per object
+    def _fromisoformat(value):
+        return datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+
+def _parse_timestamp(value):
+    """Parses S3's ISO 8601 timestamps with the C datetime parser, deferring anything else to botocore."""
+    try:
+        return _fromisoformat(value)
+    except (TypeError, ValueError):
+        return botocore_parsers.DEFAULT_TIMESTAMP_PARSER(value)
+
+class _FastXMLParsing:
+    """
+    Mixin for rest-xml parsers in ListObjectsV2-heavy workloads: timestamps (one
+    per object) skip dateutil, and the response tree is built with lxml when it
+    is installed.
+    """
+    def __init__(self, timestamp_parser=None, blob_parser=None):
+        super().__init__(timestamp_parser or _parse_timestamp, blob_parser)
+
+    if lxml_etree is not None:
+        # No entity expansion or network access, same as the stdlib parser
+        _XML_PARSER = lxml_etree.XMLParser(resolve_entities=False, no_network=True,
+                                           remove_comments=True, remove_pis=True)
+
+        def _parse_xml_string_to_dom(self, xml_string):
+            try:
+                return lxml_etree.fromstring(xml_string, parser=self._XML_PARSER)
+            except lxml_etree.XMLSyntaxError as e:
+                raise botocore_parsers.ResponseParserError(
+                    f"Unable to parse response ({e}), "
+                    f"invalid XML received. Further retries may succeed:\n{xml_string}"
+                )
+
+class _FastRestXMLParser(_FastXMLParsing, botocore_parsers.RestXMLParser):
+    pass
+
+class _FastParserFactory(botocore_parsers.ResponseParserFactory):
+    """
+    Hands out _FastRestXMLParser for rest-xml. Registered only on the botocore
+    session behind this module's S3 client, so other clients in the process
+    keep botocore's stock parsers.
+    """
+    def create_parser(self, protocol_name):
+        if protocol_name == 'rest-xml':
+            return _FastRestXMLParser(**self._defaults)
+        return super().create_parser(protocol_name)
+
+if aioboto3 is not None:
+    class _AioFastRestXMLParser(_FastXMLParsing, aiobotocore_parsers.AioRestXMLParser):
+        pass
+
+    class _AioFastParserFactory(aiobotocore_parsers.AioResponseParserFactory):
+        """_FastParserFactory for the aiobotocore session behind each async analysis."""
+        def create_parser(self, protocol_name):
+            if protocol_name == 'rest-xml':
+                return _AioFastRestXMLParser(**self._defaults)
+            return super().create_parser(protocol_name)
+
+def _drop_placeholders(table):
+    """Removes folder placeholders (zero-byte keys ending in '/') from a listing table."""
+    placeholder = pc.and_kleene(pc.equal(table['Size'], 0), pc.ends_with(table['Key'], '/'))
+    return table.filter(pc.invert(pc.fill_null(placeholder, False)))
+
+def _page_table(contents):
+    """
+    Converts one ListObjectsV2 page's 'Contents' into a LISTING_SCHEMA table.
+    Placeholders are masked per page, so they never reach the concatenated table.
+    """
+    return _drop_placeholders(pa.Table.from_pylist(contents, schema=LISTING_SCHEMA))
+
+def _page_last_entry(page):
+    """Greatest key or common prefix in a ListObjectsV2 page ('' if it is empty)."""
+    last_key = page['Contents'][-1]['Key'] if page.get('Contents') else ''
+    last_prefix = page['CommonPrefixes'][-1]['Prefix'] if page.get('CommonPrefixes') else ''
+    return max(last_key, last_prefix)
+
+def _clip_page(page, start_after, end):
+    """
+    Keeps only the entries of a page in the keyspace range (start_after, end]
+    (None means unbounded). S3 returns keys in UTF-8 byte order, which matches
+    Python's str ordering.
+
+    Returns:
+        tuple: (page, past_end) - past_end is True once the listing has gone
+               beyond `end` and no further pages are needed.
+    """
+    prefixes = page.get('CommonPrefixes', [])
+    past_end = end is not None and _page_last_entry(page) > end
+    # StartAfter inside a rolled-up common prefix returns that prefix again
+    repeats_start = start_after is not None and prefixes and prefixes[0]['Prefix'] <= start_after
+    if past_end or repeats_start:
+        def in_range(name):
+            return (start_after is None or name > start_after) and (end is None or name <= end)
+        page = dict(page,
+                    Contents=[o for o in page.get('Contents', []) if in_range(o['Key'])],
+                    CommonPrefixes=[cp for cp in prefixes if in_range(cp['Prefix'])])
+    return page, past_end
+
+def _largest(table, n):
+    """Rows of the n largest objects of a listing table (by Size, in no particular order)."""
+    if table.num_rows <= n:
+        return table
+    sizes_bytes = table['Size'].fill_null(0).to_numpy()
+    keep = np.argpartition(sizes_bytes, -n)[-n:] if n > 0 else np.arange(0)
+    return table.take(pa.array(keep))
+
+def _storage_classes(column):
+    """StorageClass column as a pandas categorical; missing values mean STANDARD."""
+    # Recode onto the fixed vocabulary first so the fill value is always a valid category
+    raw_classes = column.to_pandas()
+    storage_classes = raw_classes.astype(STORAGE_CLASS_DTYPE)
+    if (storage_classes.isna() & raw_classes.notna()).any():
+        # A class outside the known vocabulary; infer categories from the data instead
+        return raw_classes.astype(object).fillna('STANDARD').astype('category')
+    return storage_classes.fillna('STANDARD')
+
+def _cache_validator_of(first):
+    """
+    Cache validator (see S3Analyzer._cache_validator) for the first object of a
+    listing in key order, a ListObjectsV2 'Contents' entry; '' when there is none.
+    """
+    if first is None:
+        return ''
+    return f"{first['Key']}|{first['LastModified'].isoformat()}|{first.get('ETag', '')}"
+
+class _ListingSink:
+    """
+    Collects the listing pages of one shard (or, once merged, a whole analysis)
+    keeping only what the detail level needs: every column for 'full'; only
+    Size and StorageClass (for the aggregates) for 'summary'; and for 'top_n'
+    those two columns plus the full rows of the running top_n largest objects,
+    compacted as pages arrive. Each worker fills its own sink, so no locking.
+    """
+    AGGREGATE_COLUMNS = ['Size', 'StorageClass']
+
+    def __init__(self, detail_level='full', top_n=1000):
+        self.detail_level = detail_level
+        self.top_n = top_n
+        self.tables = [] # LISTING_SCHEMA pages for 'full', AGGREGATE_COLUMNS only otherwise
+        self.top = [] # 'top_n' only: candidate rows, never much more than 2 * top_n
+        self._top_rows = 0
+        self.first = None # First raw entry in key order (placeholders included), for the cache validator
+
+    def spawn(self):
+        """Returns an empty sink with the same settings, for a worker."""
+        return _ListingSink(self.detail_level, self.top_n)
+
+    def add_page(self, contents):
+        """Adds one ListObjectsV2 page's 'Contents'."""
+        self._see_first(contents[0]) # S3 returns each page in key order
+        table = _page_table(contents)
+        if self.detail_level == 'full':
+            self.tables.append(table)
+            return
+        self.tables.append(table.select(self.AGGREGATE_COLUMNS)) # Keys and timestamps are dropped here
+        if self.detail_level == 'top_n':
+            self._add_top(table)
+
+    def merge(self, other):
+        """Moves a worker's pages into this sink."""
+        self.tables.extend(other.tables)
+        for table in other.top:
+            self._add_top(table)
+        if other.first is not None:
+            self._see_first(other.first)
+        other.tables, other.top = [], []
+
+    def _see_first(self, entry):
+        if self.first is None or entry['Key'] < self.first['Key']:
+            self.first = {k: entry[k] for k in ('Key', 'LastModified', 'ETag') if k in entry}
+
+    def _add_top(self, table):
+        self.top.append(table)
+        self._top_rows += table.num_rows
+        if self._top_rows > 2 * self.top_n:
+            self._compact()
+
+    def _compact(self):
+        table = _largest(pa.concat_tables(self.top), self.top_n)
+        self.top = [table]
+        self._top_rows = table.num_rows
+
+    def finish(self):
+        """
+        Concatenates the collected pages and releases them.
+
+        Returns:
+            tuple: (table, detail_table) - the table the aggregates are computed
+                   on, and for 'top_n' the (at most top_n) largest objects' full
+                   rows (None otherwise).
+        """
+        if self.tables:
+            table = pa.concat_tables(self.tables)
+        else:
+            table = LISTING_SCHEMA.empty_table()
+            if self.detail_level != 'full':
+                table = table.select(self.AGGREGATE_COLUMNS)
+        detail_table = None
+        if self.detail_level == 'top_n':
+            detail_table = _largest(pa.concat_tables(self.top), self.top_n) if self.top else LISTING_SCHEMA.empty_table()
+        self.tables, self.top = [], []
+        return table, detail_table
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _size_histogram(sizes_bytes):
+        """Counts objects per size category (SIZE_LABELS order) in one parallel pass."""
+        low, mid, high = SIZE_THRESHOLDS_BYTES[0], SIZE_THRESHOLDS_BYTES[1], SIZE_THRESHOLDS_BYTES[2]
+        # Branch-free: count how many objects clear each threshold, then difference.
+        # Scalar accumulators are reduced safely by prange; array slots would race.
+        at_least_low = at_least_mid = at_least_high = 0
+        for i in numba.prange(sizes_bytes.shape[0]):
+            size = sizes_bytes[i]
+            at_least_low += np.int64(size >= low)
+            at_least_mid += np.int64(size >= mid)
+            at_least_high += np.int64(size >= high)
+        return np.array([sizes_bytes.shape[0] - at_least_low, at_least_low - at_least_mid,
+                         at_least_mid - at_least_high, at_least_high], dtype=np.int64)
+
 class S3Analyzer:
     """
     Analyzes S3 bucket contents providing metrics like size, object count,
     size distribution, and storage class distribution.
     """
-    def __init__(self, config_path='config.yaml'):
+    def __init__(self, config_path='config.yaml', on_error=None, on_warning=None):
         """
         Initializes the S3Analyzer.
 
         Args:
             config_path (str): Path to the configuration YAML file.
+            on_error (callable): Called with a user-facing message for every error
+                (e.g. st.error). Errors are always logged; default: no-op.
+            on_warning (callable): Same for warnings (e.g. st.warning).
         """
+        self._on_error = on_error or (lambda msg: None)
+        self._on_warning = on_warning or (lambda msg: None)
         self.config = self._load_config(config_path)
         self.s3_client = self._initialize_s3_client()
-        self.cache = {} # Simple in-memory cache
 
         # Stop initialization if config or client failed
         if not self.config or not self.s3_client:
             raise ValueError("Failed to initialize S3Analyzer due to configuration or S3 client error.")
 
+        analysis = self.config.get('analysis', {})
+        self._cache_ttl = analysis.get('cache_ttl_s', 3600)
+        # Bounded, expiring in-memory cache (entries may hold full object frames)
+        self.cache = cachetools.TTLCache(maxsize=128, ttl=self._cache_ttl)
+        self._cache_lock = threading.Lock() # The analyzer is shared across Streamlit sessions
+        self._disk_cache = None
+        if analysis.get('cache_dir'):
+            if diskcache is not None:
+                self._disk_cache = diskcache.Cache(analysis['cache_dir'])
+            else:
+                logging.warning("analysis.cache_dir is set but diskcache is not installed; results won't persist.")
+
+        # asyncio listing needs the optional aioboto3 package; boto3 threads are the fallback
+        self._async_enabled = aioboto3 is not None and self.config.get('analysis', {}).get('use_asyncio', True)
+
     def _load_config(self, config_path):
         """Loads configuration from YAML file safely."""
         try:
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
-                logging.info(f"Configuration loaded successfully from {config_path}")
-                 # Basic validation
-                if 'aws' not in config or not all(k in config['aws'] for k in ['region', 'access_key_id', 'secret_access_key']):
-                    logging.error("AWS configuration section is missing or incomplete in config file.")
-                    st.error("AWS configuration section is missing or incomplete in config file.")
-                    return None
-                return config
+            config = read_config(config_path)
+            logging.info(f"Configuration loaded successfully from {config_path}")
+             # Basic validation
+            if 'aws' not in config or not all(k in config['aws'] for k in ['region', 'access_key_id', 'secret_access_key']):
+                logging.error("AWS configuration section is missing or incomplete in config file.")
+                self._on_error("AWS configuration section is missing or incomplete in config file.")
+                return None
+            return config
         except FileNotFoundError:
             logging.error(f"Configuration file not found at {config_path}")
-            st.error(f"Configuration file '{config_path}' not found.")
+            self._on_error(f"Configuration file '{config_path}' not found.")
             return None
-        except yaml.YAMLError as e:
-            logging.error(f"Error parsing YAML file {config_path}: {e}")
-            st.error(f"Error parsing configuration file: {e}")
+        except (yaml.YAMLError, json.JSONDecodeError) as e:
+            logging.error(f"Error parsing config file {config_path}: {e}")
+            self._on_error(f"Error parsing configuration file: {e}")
             return None
         except Exception as e:
             logging.error(f"An unexpected error occurred loading configuration: {e}")
-            st.error(f"An unexpected error occurred loading configuration: {e}")
+            self._on_error(f"An unexpected error occurred loading configuration: {e}")
             return None
 
+    def _client_config(self):
+        """Botocore client config shared by the sync and async S3 clients."""
+        analysis = self.config.get('analysis', {})
+        # Listings carry no payload to checksum; only compute/validate checksums where
+        # an operation requires them (these options exist from botocore 1.36 on)
+        checksums = {option: 'when_required' for option
+                     in ('request_checksum_calculation', 'response_checksum_validation')
+                     if option in Config.OPTION_DEFAULTS}
+        return Config(
+            # Large enough pool so concurrent prefix listings don't queue on connections
+            max_pool_connections=64,
+            tcp_keepalive=True, # Keep pooled connections alive between pages
+            s3={'addressing_style': 'virtual'},
+            # Adaptive mode backs off client-side when S3 starts throttling the fan-out
+            retries={'max_attempts': analysis.get('retry_attempts', 10), 'mode': 'adaptive'},
+            # Every request is built here with a fixed shape; skip re-validating it per call
+            parameter_validation=False,
+            **checksums
+        )
+
     def _initialize_s3_client(self):
         """Initializes and returns the Boto3 S3 client."""
         if not self.config: # Ensure config loaded
@@ -68,191 +407,662 @@ class S3Analyzer:
 
             if not all([access_key, secret_key, region]):
                  logging.error("AWS credentials or region missing in configuration.")
-                 st.error("AWS Access Key ID, Secret Access Key, or Region missing in configuration.")
+                 self._on_error("AWS Access Key ID, Secret Access Key, or Region missing in configuration.")
                  return None
 
-            client = boto3.client(
-                's3',
+            # Clients pick their response parser up from their own session when created
+            botocore_session = botocore.session.Session()
+            botocore_session.register_component('response_parser_factory', _FastParserFactory())
+            session = boto3.Session(
                 aws_access_key_id=str(access_key),
                 aws_secret_access_key=str(secret_key),
-                region_name=str(region)
+                region_name=str(region),
+                botocore_session=botocore_session
             )
+            client = session.client('s3', config=self._client_config())
             # Test credentials line removed:
             # client.list_buckets() # <-- THIS LINE IS REMOVED
             logging.info("Boto3 S3 client initialized successfully.")
             return client
         except (NoCredentialsError, PartialCredentialsError):
             logging.error("AWS credentials not found or incomplete.")
-            st.error("AWS credentials not found, incomplete, or invalid. Please check config.yaml.")
+            self._on_error("AWS credentials not found, incomplete, or invalid. Please check config.yaml.")
             return None
         except ProfileNotFound as e:
              logging.error(f"AWS profile specified in config not found: {e}")
-             st.error(f"AWS profile specified in config not found: {e}")
+             self._on_error(f"AWS profile specified in config not found: {e}")
              return None
         except ClientError as e:
             # Handle specific client errors like invalid credentials
             error_code = e.response.get('Error', {}).get('Code')
             if error_code == 'InvalidClientTokenId' or error_code == 'SignatureDoesNotMatch':
                  logging.error(f"Invalid AWS credentials provided: {error_code}")
-                 st.error("Invalid AWS credentials provided. Please check config.yaml.")
+                 self._on_error("Invalid AWS credentials provided. Please check config.yaml.")
             elif error_code == 'AccessDenied':
                  logging.error(f"Initial Access Denied checking S3 client: {e}")
-                 st.error(f"Access Denied during S3 client initialization. Check basic S3 permissions for the user.")
+                 self._on_error(f"Access Denied during S3 client initialization. Check basic S3 permissions for the user.")
             else:
                  logging.error(f"Failed to initialize S3 client due to ClientError: {e}")
-                 st.error(f"Failed to initialize S3 client: {e}")
+                 self._on_error(f"Failed to initialize S3 client: {e}")
             return None
         except Exception as e:
             logging.error(f"An unexpected error occurred initializing S3 client: {e}")
-            st.error(f"An unexpected error occurred initializing S3 client: {e}")
+            self._on_error(f"An unexpected error occurred initializing S3 client: {e}")
             return None
 
-    def _get_size_category(self, size_mb):
-        """Categorizes objects by size in MB."""
-        if size_mb < 1:
-            return "Small (<1MB)"
-        elif size_mb < 10:
-            return "Medium (1-10MB)"
-        elif size_mb < 100:
-            return "Large (10-100MB)"
+    def _iter_pages(self, bucket_name, prefix, lookahead=4, **params):
+        """
+        Yields ListObjectsV2 pages for a prefix. A background thread issues the
+        requests back to back (each continuation token is only known once the
+        previous page arrives) and buffers up to `lookahead` pages, so the
+        network round-trips keep running while the caller processes earlier pages.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            prefix (str): The prefix to list.
+            lookahead (int): Maximum number of fetched pages waiting to be consumed.
+            **params: Extra ListObjectsV2 parameters (e.g. Delimiter).
+        """
+        request = dict(Bucket=bucket_name, Prefix=prefix, MaxKeys=1000, FetchOwner=False, **params)
+        buffer = queue.Queue(maxsize=lookahead)
+        stop = threading.Event()
+
+        list_page = self.s3_client.list_objects_v2 # Resolve the generated client method once
+
+        def produce():
+            token = {}
+            try:
+                while not stop.is_set():
+                    page = list_page(**request, **token)
+                    buffer.put(page)
+                    if not page.get('IsTruncated'):
+                        return
+                    token = {'ContinuationToken': page['NextContinuationToken']}
+            finally:
+                buffer.put(None) # End of stream (also on error)
+
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            producer = prefetch.submit(produce)
+            try:
+                while (page := buffer.get()) is not None:
+                    yield page
+                producer.result() # Re-raise any listing error in the caller
+            finally:
+                # Consumer stopped early: unblock a producer waiting on a full buffer
+                stop.set()
+                while not producer.done():
+                    try:
+                        buffer.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+
+    def _list_common_prefixes(self, bucket_name, prefix, sink, start_after=None, end=None):
+        """
+        Lists the first level below a prefix with Delimiter='/', optionally
+        restricted to the keyspace range (start_after, end].
+
+        Returns:
+            tuple: (sink, subprefixes) - the _ListingSink holding the objects
+                   directly under the prefix, and the common prefixes.
+        """
+        subprefixes = []
+        params = {'StartAfter': start_after} if start_after else {}
+        for page in self._iter_pages(bucket_name, prefix, Delimiter='/', **params):
+            page, past_end = _clip_page(page, start_after, end)
+            subprefixes.extend(cp['Prefix'] for cp in page.get('CommonPrefixes', []))
+            if page.get('Contents'):
+                sink.add_page(page['Contents'])
+            if past_end:
+                break
+        return sink, subprefixes
+
+    def _shard_ranges(self, prefix, probe, splits):
+        """
+        Splits the keyspace after a probe page into (start_after, end] ranges
+        at prefix + c for evenly spaced characters c of analysis.split_alphabet
+        (hex by default, matching hashed/UUID key names). The first range
+        starts after the probe's last entry, the last one is unbounded.
+        """
+        alphabet = sorted(self.config.get('analysis', {}).get('split_alphabet', '0123456789abcdef'))
+        cuts = sorted({alphabet[i * len(alphabet) // splits] for i in range(1, splits)}) if splits > 1 else []
+        ranges = []
+        start_after = _page_last_entry(probe)
+        for end in [prefix + c for c in cuts] + [None]:
+            if end is not None and end <= start_after:
+                continue # Already covered by the probe
+            ranges.append((start_after, end))
+            start_after = end
+        return ranges
+
+    def _parallel_list(self, bucket_name, prefix, sink, splits=16):
+        """
+        Lists the first level below a prefix (as _list_common_prefixes), but
+        splits the keyspace into up to `splits` StartAfter ranges listed
+        concurrently. S3 paginates a single prefix strictly sequentially, so
+        this is what parallelizes a large flat prefix. A single probe page is
+        fetched first; if it is not truncated (fewer than 1000 entries) that
+        page is the whole answer and no shards are started.
+
+        Returns:
+            list: The common prefixes; objects are added to `sink`.
+        """
+        probe = self.s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix, Delimiter='/',
+                                               MaxKeys=1000, FetchOwner=False)
+        if probe.get('Contents'):
+            sink.add_page(probe['Contents'])
+        subprefixes = [cp['Prefix'] for cp in probe.get('CommonPrefixes', [])]
+        if not probe.get('IsTruncated'):
+            return subprefixes
+
+        ranges = self._shard_ranges(prefix, probe, splits)
+        logging.info(f"Listing {bucket_name}/{prefix} in {len(ranges)} keyspace ranges")
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [executor.submit(self._list_common_prefixes, bucket_name, prefix, sink.spawn(), start_after, end)
+                       for start_after, end in ranges]
+            for future in futures: # In keyspace order
+                range_sink, range_subprefixes = future.result()
+                sink.merge(range_sink)
+                subprefixes.extend(range_subprefixes)
+        return subprefixes
+
+    def _scan_prefix(self, bucket_name, prefix, sink):
+        """
+        Lists every object under a single prefix. Runs inside a worker thread;
+        boto3 clients are thread-safe, and all state is local.
+
+        Returns:
+            _ListingSink: `sink`, holding the prefix's objects.
+        """
+        processed_pages = 0
+        for page in self._iter_pages(bucket_name, prefix):
+            processed_pages += 1
+            if page.get('Contents'):
+                sink.add_page(page['Contents'])
+            if processed_pages % 50 == 0:
+                 logging.info(f"Processed {processed_pages} pages for {bucket_name}/{prefix}...")
+
+        return sink
+
+    def _summarize_objects(self, table, detail_level='full', top_n=1000, detail_table=None):
+        """
+        Computes bucket metrics from object metadata held column-wise. The
+        aggregates are computed on NumPy views of the columns and keys stay in
+        Arrow memory, so no per-object Python values are created.
+
+        Args:
+            table (pa.Table): One row per object with 'Key', 'Size' (bytes),
+                'LastModified' and 'StorageClass' columns, folder placeholders
+                already removed (see _drop_placeholders).
+            detail_level (str): 'full' keeps every object, 'top_n' only the
+                top_n largest (largest first), 'summary' none (objects is None).
+            top_n (int): Number of objects kept for 'top_n'.
+            detail_table (pa.Table): Rows to build 'objects' from when `table`
+                only carries the aggregate columns (see _ListingSink); defaults
+                to `table`.
+
+        Returns:
+            dict: 'total_size_mb', 'total_objects', 'average_size_mb',
+                  'size_distribution', 'storage_class_distribution', 'objects'
+                  and 'detail_level'.
+        """
+        if detail_level not in DETAIL_LEVELS:
+            raise ValueError(f"detail_level must be one of {DETAIL_LEVELS}, got {detail_level!r}")
+        sizes_bytes = table['Size'].fill_null(0).to_numpy().astype(np.int64, copy=False)
+        storage_classes = _storage_classes(table['StorageClass'])
+
+        if numba is not None:
+            size_counts = _size_histogram(sizes_bytes)
         else:
-            return "Very Large (>100MB)"
+            # side='right' keeps the "< 1MB", "< 10MB", "< 100MB" boundaries
+            size_counts = np.bincount(np.searchsorted(SIZE_THRESHOLDS_BYTES, sizes_bytes, side='right'),
+                                      minlength=len(SIZE_LABELS))
+        class_counts = np.bincount(storage_classes.cat.codes.to_numpy(),
+                                   minlength=len(storage_classes.cat.categories))
+        size_distribution = {label: int(count) for label, count in zip(SIZE_LABELS, size_counts) if count}
+        storage_class_distribution = {label: int(count) for label, count
+                                      in zip(storage_classes.cat.categories, class_counts) if count}
+
+        total_objects = len(sizes_bytes)
+        total_size_mb = int(sizes_bytes.sum()) / (1024 * 1024)
+        average_size_mb = (total_size_mb / total_objects) if total_objects > 0 else 0
+
+        objects_df = None
+        if detail_level != 'summary':
+            if detail_table is not None:
+                table = detail_table
+                sizes_bytes = table['Size'].fill_null(0).to_numpy().astype(np.int64, copy=False)
+                storage_classes = _storage_classes(table['StorageClass'])
+            if detail_level == 'top_n':
+                # Partial selection: O(n) to find the largest top_n, then sort only those
+                keep = np.arange(len(sizes_bytes))
+                if top_n < len(sizes_bytes):
+                    keep = np.argpartition(sizes_bytes, -top_n)[-top_n:] if top_n > 0 else keep[:0]
+                keep = keep[np.argsort(sizes_bytes[keep], kind='stable')[::-1]]
+                table = table.take(pa.array(keep))
+                sizes_bytes = sizes_bytes[keep]
+                storage_classes = storage_classes.iloc[keep].reset_index(drop=True)
+            # Columnar result: Arrow-backed keys (wrapping the listing buffers), categorical
+            # storage class and a real UTC timestamp column (formatting is left to the display layer)
+            objects_df = pd.DataFrame({
+                'Key': pd.arrays.ArrowStringArray(table['Key'].cast(pa.string())),
+                'Size (MB)': np.round(sizes_bytes / (1024 * 1024), 2), # MB only for display
+                'Last Modified': pd.to_datetime(table['LastModified'].to_pandas(), utc=True).astype('datetime64[ns, UTC]'),
+                'Storage Class': storage_classes,
+            })
+
+        return {
+            'total_size_mb': round(total_size_mb, 2),
+            'total_objects': total_objects,
+            'average_size_mb': round(average_size_mb, 2),
+            'size_distribution': size_distribution,
+            'storage_class_distribution': storage_class_distribution,
+            'objects': objects_df,
+            'detail_level': detail_level,
+        }
+
+    def _fanout(self, bucket_name, prefix, sink):
+        """
+        Lists a prefix by handing each first-level sub-prefix to a thread pool.
+
+        Returns:
+            _ListingSink: `sink`, holding every listed object.
+        """
+        analysis = self.config.get('analysis', {})
+        max_workers = analysis.get('max_workers', 32)
+
+        # Objects directly under the prefix are collected here; every
+        # common prefix is handed off to the thread pool. Workers only
+        # return local results, so no locking is needed.
+        subprefixes = self._parallel_list(bucket_name, prefix, sink, analysis.get('list_splits', 16))
+
+        logging.info(f"Listing {len(subprefixes)} sub-prefixes of {bucket_name}/{prefix} with {max_workers} workers")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._scan_prefix, bucket_name, sub, sink.spawn()) for sub in subprefixes]
+            for future in futures:
+                sink.merge(future.result())
+        return sink
+
+    def _new_aio_session(self):
+        """
+        Creates an aioboto3 session. Sessions aren't thread-safe and the analyzer
+        is shared across threads, so each analysis (one asyncio.run) gets its own.
+        Its clients parse responses with _AioFastRestXMLParser, like the sync client.
+        """
+        botocore_session = AioSession()
+        botocore_session.register_component('response_parser_factory', _AioFastParserFactory())
+        return aioboto3.Session(
+            aws_access_key_id=str(self.config['aws']['access_key_id']),
+            aws_secret_access_key=str(self.config['aws']['secret_access_key']),
+            region_name=str(self.config['aws']['region']),
+            botocore_session=botocore_session
+        )
+
+    async def _alist(self, s3, semaphore, bucket_name, prefix, sink, start_after=None, end=None, **params):
+        """
+        Fetches every ListObjectsV2 page for a prefix with an async client,
+        optionally restricted to the keyspace range (start_after, end].
+        The shared semaphore bounds how many prefixes are paginated at once.
+        Each page is added to the sink as it arrives, so the raw response
+        dicts are released page by page instead of held until the end.
+
+        Returns:
+            tuple: (sink, subprefixes), as _list_common_prefixes.
+        """
+        paginator = s3.get_paginator('list_objects_v2')
+        if start_after:
+            params['StartAfter'] = start_after
+        subprefixes = []
+        async with semaphore:
+            async for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix, FetchOwner=False, **params):
+                page, past_end = _clip_page(page, start_after, end)
+                subprefixes.extend(cp['Prefix'] for cp in page.get('CommonPrefixes', []))
+                if page.get('Contents'):
+                    sink.add_page(page['Contents'])
+                if past_end:
+                    break
+        return sink, subprefixes
+
+    async def _get_bucket_metrics_async(self, bucket_name, prefix, sink):
+        """
+        Async counterpart of the threaded listing: one coroutine per keyspace
+        range of the first level (see _parallel_list) and per first-level
+        sub-prefix, all sharing a single aioboto3 client and gathered on one
+        event loop.
 
-    def get_bucket_metrics(self, bucket_name, prefix):
+        Returns:
+            _ListingSink: `sink`, holding every listed object.
+        """
+        # Cap in-flight requests well below S3's per-prefix request rate limit
+        semaphore = asyncio.Semaphore(64)
+        async with self._new_aio_session().client('s3', config=self._client_config()) as s3:
+            async with semaphore:
+                probe = await s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix, Delimiter='/',
+                                                 MaxKeys=1000, FetchOwner=False)
+            if probe.get('Contents'):
+                sink.add_page(probe['Contents'])
+            subprefixes = [cp['Prefix'] for cp in probe.get('CommonPrefixes', [])]
+            if probe.get('IsTruncated'):
+                ranges = self._shard_ranges(prefix, probe, self.config.get('analysis', {}).get('list_splits', 16))
+                results = await asyncio.gather(*(self._alist(s3, semaphore, bucket_name, prefix, sink.spawn(),
+                                                             start_after, end, Delimiter='/')
+                                                 for start_after, end in ranges))
+                for range_sink, range_subprefixes in results: # In keyspace order
+                    sink.merge(range_sink)
+                    subprefixes.extend(range_subprefixes)
+
+            logging.info(f"Listing {len(subprefixes)} sub-prefixes of {bucket_name}/{prefix} with asyncio")
+            results = await asyncio.gather(*(self._alist(s3, semaphore, bucket_name, sub, sink.spawn())
+                                             for sub in subprefixes))
+            for sub_sink, _ in results: # No Delimiter, so no common prefixes below this level
+                sink.merge(sub_sink)
+        return sink
+
+    def _metrics_from_listing(self, sink, detail_level='full', top_n=1000):
+        """Concatenates the collected listing pages and aggregates them in one vectorized pass."""
+        table, detail_table = sink.finish() # The sink lets go of its pages here
+        metrics = self._summarize_objects(table, detail_level, top_n, detail_table)
+        metrics['source'] = 'live'
+        # The listing saw the first key anyway, so no separate probe is needed to cache this
+        metrics['cache_validator'] = _cache_validator_of(sink.first)
+        return metrics
+
+    def get_bucket_metrics(self, bucket_name, prefix, detail_level='full', top_n=1000):
         """
         Retrieves and calculates detailed metrics for objects within a
         specified S3 bucket and prefix.
 
+        The first level below the prefix is enumerated with Delimiter='/' and
+        each resulting sub-prefix (always '/'-terminated) is listed
+        concurrently, as coroutines when async listing is enabled and on a
+        thread pool otherwise, so independent ListObjectsV2 round-trips overlap.
+
         Args:
             bucket_name (str): The name of the S3 bucket.
             prefix (str): The prefix (folder path) within the bucket.
+            detail_level (str): 'full', 'top_n' or 'summary' (see analyze_bucket).
+            top_n (int): Number of largest objects kept for 'top_n'.
 
         Returns:
             dict: A dictionary containing calculated metrics, or None if an error occurs.
-                  Keys include: 'total_size_mb', 'total_objects', 'objects' (list),
-                  'size_distribution', 'storage_class_distribution', 'average_size_mb'.
+                  Keys include: 'total_size_mb', 'total_objects', 'objects' (DataFrame,
+                  or None for 'summary'), 'size_distribution', 'storage_class_distribution',
+                  'average_size_mb'.
         """
         if not self.s3_client:
-            st.error("S3 client not initialized. Cannot analyze bucket.")
+            logging.error("S3 client not initialized. Cannot analyze bucket.")
+            self._on_error("S3 client not initialized. Cannot analyze bucket.")
             return None
 
         logging.info(f"Starting analysis for bucket: '{bucket_name}', prefix: '{prefix}'")
         start_time = time.time()
-        total_size_bytes = 0
-        total_objects = 0
-        objects_list = []
-        size_distribution = {}
-        storage_class_distribution = {}
 
         try:
-            paginator = self.s3_client.get_paginator('list_objects_v2')
-            pages = paginator.paginate(Bucket=bucket_name, Prefix=prefix)
-
-            processed_pages = 0
-            for page in pages:
-                processed_pages += 1
-                if 'Contents' in page:
-                    for obj in page['Contents']:
-                        if obj['Size'] == 0 and obj['Key'].endswith('/'):
-                            continue # Skip potential folder placeholders
-
-                        size_bytes = obj['Size']
-                        size_mb = size_bytes / (1024 * 1024)
-                        total_size_bytes += size_bytes
-                        total_objects += 1
-                        storage_class = obj.get('StorageClass', 'STANDARD')
-
-                        storage_class_distribution[storage_class] = storage_class_distribution.get(storage_class, 0) + 1
-                        size_category = self._get_size_category(size_mb)
-                        size_distribution[size_category] = size_distribution.get(size_category, 0) + 1
-
-                        last_modified_str = "N/A"
-                        if 'LastModified' in obj:
-                            try:
-                                # Ensure LastModified is a datetime object before formatting
-                                if isinstance(obj['LastModified'], datetime):
-                                     last_modified_str = obj['LastModified'].strftime('%Y-%m-%d %H:%M:%S')
-                                else:
-                                     logging.warning(f"LastModified for key {obj['Key']} is not a datetime object: {type(obj['LastModified'])}")
-                            except AttributeError:
-                                logging.warning(f"Could not format LastModified for key: {obj['Key']}")
-                            except Exception as dt_err:
-                                logging.warning(f"Unexpected error formatting LastModified for key {obj['Key']}: {dt_err}")
-
-
-                        objects_list.append({
-                            'Key': obj['Key'],
-                            'Size (MB)': round(size_mb, 2),
-                            'Last Modified': last_modified_str,
-                            'Storage Class': storage_class
-                        })
-                if processed_pages % 50 == 0:
-                     logging.info(f"Processed {processed_pages} pages for {bucket_name}/{prefix}...")
-
-            total_size_mb = total_size_bytes / (1024 * 1024)
-            average_size_mb = (total_size_mb / total_objects) if total_objects > 0 else 0
+            # Only the columns/rows detail_level needs are kept while listing
+            sink = _ListingSink(detail_level, top_n)
+            if self._async_enabled:
+                asyncio.run(self._get_bucket_metrics_async(bucket_name, prefix, sink))
+            else:
+                self._fanout(bucket_name, prefix, sink)
+            metrics = self._metrics_from_listing(sink, detail_level, top_n)
+
             analysis_duration = time.time() - start_time
             logging.info(f"Analysis complete for {bucket_name}/{prefix}. "
-                         f"Objects: {total_objects}, Total Size: {total_size_mb:.2f} MB. "
+                         f"Objects: {metrics['total_objects']}, Total Size: {metrics['total_size_mb']:.2f} MB. "
                          f"Duration: {analysis_duration:.2f}s")
-
-            return {
-                'total_size_mb': round(total_size_mb, 2),
-                'total_objects': total_objects,
-                'average_size_mb': round(average_size_mb, 2),
-                'size_distribution': size_distribution,
-                'storage_class_distribution': storage_class_distribution,
-                'objects': objects_list,
-            }
+            return metrics
 
         except ClientError as e:
             error_code = e.response.get('Error', {}).get('Code')
             error_message = e.response.get('Error', {}).get('Message', str(e))
             logging.error(f"AWS ClientError analyzing bucket '{bucket_name}/{prefix}': {error_code} - {error_message}")
             if error_code == 'NoSuchBucket':
-                 st.error(f"Error: Bucket '{bucket_name}' not found or you don't have permission to access it.")
+                 self._on_error(f"Error: Bucket '{bucket_name}' not found or you don't have permission to access it.")
             elif error_code == 'AccessDenied':
-                 st.error(f"Error: Access Denied. Check IAM permissions for s3:ListBucket on '{bucket_name}'.")
+                 self._on_error(f"Error: Access Denied. Check IAM permissions for s3:ListBucket on '{bucket_name}'.")
             elif error_code == 'InvalidBucketName':
-                 st.error(f"Error: Invalid bucket name '{bucket_name}'. Please check the name format.")
+                 self._on_error(f"Error: Invalid bucket name '{bucket_name}'. Please check the name format.")
             else:
-                 st.error(f"An AWS error occurred during analysis: {error_code}")
+                 self._on_error(f"An AWS error occurred during analysis: {error_code}")
             return None
         except Exception as e:
             logging.error(f"An unexpected error occurred during bucket analysis for '{bucket_name}/{prefix}': {e}", exc_info=True)
-            st.error(f"An unexpected error occurred during analysis: {e}")
+            self._on_error(f"An unexpected error occurred during analysis: {e}")
             return None
 
-    def analyze_bucket(self, bucket_name, prefix, use_cache=True):
+    def _latest_inventory_manifest(self, bucket_name):
+        """
+        Locates the most recent S3 Inventory snapshot for a source bucket.
+
+        Inventory reports live under
+        '<inventory prefix>/<source bucket>/<config id>/<YYYY-MM-DDTHH-MMZ>/manifest.json'.
+
+        Returns:
+            tuple: (snapshot name, parsed manifest dict), or (None, None) if no snapshot exists.
         """
-        Analyzes the specified bucket and prefix, optionally using an in-memory cache.
+        inventory = self.config['inventory']
+        base = f"{inventory.get('prefix', '').strip('/')}/{bucket_name}/{inventory['config_id']}/".lstrip('/')
+
+        snapshots = []
+        for page in self._iter_pages(inventory['bucket'], base, Delimiter='/'):
+            snapshots.extend(cp['Prefix'] for cp in page.get('CommonPrefixes', []))
+        # Snapshot folders start with the report date; this skips data/ and hive/
+        snapshots = [p for p in snapshots if p[len(base):len(base) + 1].isdigit()]
+        if not snapshots:
+            return None, None
+
+        latest = max(snapshots)
+        response = self.s3_client.get_object(Bucket=inventory['bucket'], Key=f"{latest}manifest.json")
+        return latest[len(base):].rstrip('/'), json.loads(response['Body'].read())
+
+    def _inventory_age_hours(self, snapshot, manifest):
+        """Hours since an inventory snapshot was produced."""
+        if 'creationTimestamp' in manifest: # Milliseconds since the epoch, as a string
+            created = datetime.fromtimestamp(int(manifest['creationTimestamp']) / 1000, tz=timezone.utc)
+        else:
+            created = datetime.strptime(snapshot, '%Y-%m-%dT%H-%MZ').replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - created).total_seconds() / 3600
+
+    def analyze_bucket_from_inventory(self, bucket_name, prefix, detail_level='full', top_n=1000):
+        """
+        Computes the same metrics as get_bucket_metrics from the latest S3
+        Inventory Parquet report instead of listing every object. The report
+        must include the Size, LastModifiedDate and StorageClass fields. For
+        reports that include all object versions, only current versions that
+        aren't delete markers are counted. Snapshots older than inventory.max_age_hours (default 48) are ignored so
+        that recent changes aren't hidden behind a stale report.
 
         Args:
             bucket_name (str): The name of the S3 bucket.
             prefix (str): The prefix (folder path) within the bucket.
-            use_cache (bool): Whether to use the cache (default: True).
+            detail_level (str): 'full', 'top_n' or 'summary' (see analyze_bucket).
+            top_n (int): Number of largest objects kept for 'top_n'.
+
+        Returns:
+            dict: Same keys as get_bucket_metrics plus 'inventory_snapshot' and
+                  'inventory_age_hours', or None if no usable (fresh, Parquet)
+                  inventory report is available.
+        """
+        inventory = self.config.get('inventory')
+        if not inventory or not self.s3_client:
+            return None
+
+        logging.info(f"Reading S3 Inventory for bucket: '{bucket_name}', prefix: '{prefix}'")
+        start_time = time.time()
+        try:
+            snapshot, manifest = self._latest_inventory_manifest(bucket_name)
+            if manifest is None:
+                logging.warning(f"No S3 Inventory snapshot found for bucket '{bucket_name}'")
+                return None
+            if manifest.get('fileFormat') != 'Parquet':
+                logging.warning(f"Inventory snapshot {snapshot} is {manifest.get('fileFormat')}, only Parquet is supported")
+                return None
+            age_hours = self._inventory_age_hours(snapshot, manifest)
+            if age_hours > inventory.get('max_age_hours', 48):
+                logging.info(f"Inventory snapshot {snapshot} is {age_hours:.1f}h old; using live listing instead")
+                return None
+
+            s3fs = pafs.S3FileSystem(
+                access_key=str(self.config['aws']['access_key_id']),
+                secret_key=str(self.config['aws']['secret_access_key']),
+                region=str(self.config['aws']['region'])
+            )
+            dataset = ds.dataset(
+                [f"{inventory['bucket']}/{f['key']}" for f in manifest.get('files', [])],
+                format='parquet',
+                filesystem=s3fs
+            )
+            conditions = [pc.starts_with(pc.field('key'), prefix)] if prefix else []
+            # Reports with all object versions also list noncurrent versions and delete
+            # markers; keep only what a live listing would return
+            if 'is_latest' in dataset.schema.names:
+                conditions.append(pc.field('is_latest'))
+            if 'is_delete_marker' in dataset.schema.names:
+                conditions.append(~pc.field('is_delete_marker'))
+            row_filter = None
+            for condition in conditions:
+                row_filter = condition if row_filter is None else row_filter & condition
+            table = dataset.to_table(
+                columns=['key', 'size', 'last_modified_date', 'storage_class'],
+                filter=row_filter
+            )
+            table = _drop_placeholders(table.rename_columns(['Key', 'Size', 'LastModified', 'StorageClass']))
+
+            metrics = self._summarize_objects(table, detail_level, top_n)
+            metrics['source'] = 'inventory'
+            metrics['inventory_snapshot'] = snapshot
+            metrics['inventory_age_hours'] = round(age_hours, 1)
+            logging.info(f"Inventory analysis complete for {bucket_name}/{prefix} (snapshot {snapshot}). "
+                         f"Objects: {metrics['total_objects']}, Total Size: {metrics['total_size_mb']:.2f} MB. "
+                         f"Duration: {time.time() - start_time:.2f}s")
+            return metrics
+
+        except ClientError as e:
+            error_code = e.response.get('Error', {}).get('Code')
+            logging.warning(f"AWS ClientError reading S3 Inventory for '{bucket_name}': {error_code}")
+            return None
+        except Exception as e:
+            logging.warning(f"Could not read S3 Inventory for '{bucket_name}/{prefix}': {e}", exc_info=True)
+            return None
+
+    def _cache_validator(self, bucket_name, prefix):
+        """
+        Cheap freshness probe for cached results, used like an HTTP ETag: one
+        MaxKeys=1 listing, reduced to the first key's name, LastModified and
+        ETag. It catches the common changes (objects added in front, first
+        object rewritten or deleted) at the cost of a single request; the
+        cache TTL still bounds staleness for everything else. Only run on a
+        cache hit; live listings record the validator they store themselves.
+
+        Returns:
+            str: The validator ('' for an empty prefix), or None if the probe failed.
+        """
+        try:
+            response = self.s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix, MaxKeys=1, FetchOwner=False)
+        except (ClientError, BotoCoreError) as e:
+            logging.warning(f"Cache validation probe failed for {bucket_name}/{prefix}: {e}")
+            return None
+        return _cache_validator_of(response['Contents'][0] if response.get('Contents') else None)
+
+    def _cache_get(self, cache_key):
+        """Looks up results in memory, then on disk (promoting disk hits to memory)."""
+        with self._cache_lock:
+            results = self.cache.get(cache_key)
+        if results is not None or self._disk_cache is None:
+            return results
+
+        summary = self._disk_cache.get(cache_key)
+        if summary is None:
+            return None
+        objects = self._disk_cache.get(f"{cache_key}::objects")
+        if objects is None and summary.get('detail_level') != 'summary': # Evicted independently; treat as a miss
+            return None
+        results = dict(summary, objects=objects)
+        with self._cache_lock:
+            self.cache[cache_key] = results
+        return results
+
+    def _cache_put(self, cache_key, results):
+        """Stores results in memory and, if configured, on disk with the same TTL."""
+        with self._cache_lock:
+            self.cache[cache_key] = results
+        if self._disk_cache is not None:
+            # The object frame is by far the largest part; keep it under its own key
+            # so the summary can be read without unpickling it
+            summary = {k: v for k, v in results.items() if k != 'objects'}
+            if results.get('objects') is not None:
+                self._disk_cache.set(f"{cache_key}::objects", results['objects'], expire=self._cache_ttl)
+            self._disk_cache.set(cache_key, summary, expire=self._cache_ttl)
+
+    def analyze_bucket(self, bucket_name, prefix, use_cache=True, as_directory=False,
+                       detail_level='summary', top_n=1000, refresh=False):
+        """
+        Analyzes the specified bucket and prefix, optionally using the result
+        cache (bounded in-memory TTL cache, plus disk when analysis.cache_dir is set).
+        When an 'inventory' section is configured the latest S3 Inventory report
+        is used, falling back to live listing if it is unavailable.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            prefix (str): The prefix (folder path) within the bucket.
+            use_cache (bool): Whether to use the cache (default: True). Unless
+                analysis.validate_cache is false, a cached result is only returned
+                while a one-key listing probe still matches (see _cache_validator).
+            as_directory (bool): Treat the prefix as a folder and make it end with
+                '/', which lets S3 seek straight to it instead of scanning (default: False).
+            detail_level (str): How much per-object detail to return: 'summary' (aggregates
+                only, 'objects' is None), 'top_n' (the top_n largest objects) or 'full'
+                (every object). Each level is cached separately (default: 'summary').
+            top_n (int): Number of largest objects kept for 'top_n' (default: 1000).
+            refresh (bool): Skip the cache lookup but still store the new results,
+                replacing the cached entry in memory and on disk (default: False).
 
         Returns:
             dict: A dictionary containing analysis results, or None if analysis failed.
         """
         if not isinstance(bucket_name, str) or not bucket_name:
-             st.error("Invalid bucket name provided.")
+             logging.error(f"Invalid bucket name provided: {bucket_name!r}")
+             self._on_error("Invalid bucket name provided.")
              return None
         if not isinstance(prefix, str):
-             st.warning("Prefix is not a string, using empty prefix.")
+             logging.warning(f"Prefix {prefix!r} is not a string, using empty prefix.")
+             self._on_warning("Prefix is not a string, using empty prefix.")
              prefix = ""
+        if as_directory and prefix:
+            prefix = prefix.rstrip('/') + '/'
 
-        cache_key = f"{bucket_name}::{prefix}"
+        if detail_level not in DETAIL_LEVELS:
+             logging.error(f"Invalid detail level '{detail_level}'.")
+             self._on_error(f"Invalid detail level '{detail_level}'.")
+             return None
 
-        if use_cache and cache_key in self.cache:
-            logging.info(f"Returning cached results for {cache_key}")
-            return self.cache[cache_key]
+        level_tag = f"top_n={top_n}" if detail_level == 'top_n' else detail_level
+        cache_key = f"{bucket_name}::{prefix}::{level_tag}"
 
-        results = self.get_bucket_metrics(bucket_name, prefix)
+        validate = self.config.get('analysis', {}).get('validate_cache', True)
+        cached = self._cache_get(cache_key) if use_cache and not refresh else None
+        if cached is not None:
+            # Probe only when there is something to validate; a failed probe (None) never matches
+            validator = self._cache_validator(bucket_name, prefix) if validate else None
+            if not validate or (validator is not None and validator == cached.get('cache_validator')):
+                logging.info(f"Returning cached results for {cache_key}")
+                return cached
+            logging.info(f"Cached results for {cache_key} are stale, re-analyzing")
+
+        results = None
+        if self.config.get('inventory'):
+            results = self.analyze_bucket_from_inventory(bucket_name, prefix, detail_level, top_n)
+            if results is None:
+                logging.warning(f"S3 Inventory unavailable or stale for {bucket_name}, falling back to live listing.")
+                self._on_warning("S3 Inventory unavailable or stale, falling back to live listing.")
+        if results is None:
+            results = self.get_bucket_metrics(bucket_name, prefix, detail_level, top_n)
 
         if results and use_cache:
+            if validate and 'cache_validator' not in results:
+                # Inventory results: validate against the live bucket as of now
+                results['cache_validator'] = self._cache_validator(bucket_name, prefix)
             logging.info(f"Caching results for {cache_key}")
-            self.cache[cache_key] = results
+            self._cache_put(cache_key, results)
 
         return results
 
@@ -266,7 +1076,8 @@ class S3Analyzer:
 #             test_prefix = analyzer.config.get('prefix', 'YOUR_TEST_PREFIX/')
 #             print(f"--- Running Test Analysis ---")
 #             print(f"Bucket: {test_bucket}, Prefix: {test_prefix}")
-#             test_results = analyzer.analyze_bucket(test_bucket, test_prefix, use_cache=False)
+#             test_results = analyzer.analyze_bucket(test_bucket, test_prefix, use_cache=False,
+#                                                    detail_level='top_n', top_n=5)
 #             if test_results:
 #                 print("--- Analysis Results ---")
 #                 print(f"Total Size (MB): {test_results['total_size_mb']:.2f}")
@@ -278,8 +1089,8 @@ class S3Analyzer:
 #                 print("\nStorage Class Distribution:")
 #                 for storage_class, count in test_results['storage_class_distribution'].items():
 #                     print(f"  {storage_class}: {count:,}")
-#                 print(f"\nFirst 5 Objects:")
-#                 for obj in test_results['objects'][:5]:
+#                 print(f"\nLargest 5 Objects:")
+#                 for obj in test_results['objects'].head(5).to_dict('records'):
 #                     print(f"  - {obj['Key']} ({obj['Size (MB)']:.2f} MB, {obj['Storage Class']}, {obj['Last Modified']})")
 #             else:
 #                 print("--- Analysis Failed ---")